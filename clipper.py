@@ -1,43 +1,118 @@
 import os
-import json
+import orjson
+import math
+import bisect
 import subprocess
-from utils import fileSafe
+from concurrent.futures import ThreadPoolExecutor
+from utils import fileSafe, keyframe_times, save_segment_to_json
 
-def generate_video_clips(filename, parsed_content, output_dir="generated/video"):
+# Every segment adds an output clause to the ffmpeg command line, so cap how
+# many segments share one invocation to stay well below the argv limit.
+SEGMENTS_PER_COMMAND = 16
+
+def snap_to_keyframe(keyframes, start_time):
+    """Return the last keyframe time at or before start_time (start_time itself if there is none)."""
+    idx = bisect.bisect_right(keyframes, start_time) - 1
+    return keyframes[idx] if idx >= 0 else start_time
+
+
+def run_ffmpeg(command):
+    """Run one ffmpeg command, reporting a failure instead of raising. Returns the exit code."""
+    try:
+        return subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True).returncode
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg error: {e}")
+        print(f"stderr: {e.stderr}")
+        return e.returncode
+
+
+def generate_video_clips(filename, parsed_content, output_dir="generated/video",
+                         pool_workers=None, threads_per_invocation=None, save_json=False):
     """
     Generates video clips from a source video based on segment details.
     Saves labels and segments to files in output_dir.
+
+    Segments are cut without re-encoding: each one is an input-side seek
+    (-ss before -i) followed by a stream copy, batched into one ffmpeg
+    invocation per SEGMENTS_PER_COMMAND segments. A stream copy can only start
+    on a keyframe, so each segment's start_time is moved back to the keyframe
+    the clip really starts on; keep the returned segments so subtitles line up.
+
+    The batches run concurrently on pool_workers ffmpeg processes, each capped
+    at threads_per_invocation threads so the pool does not oversubscribe the CPU.
     
     Arguments:
         filename (str): Path to the source video file.
         parsed_content (list): List of dictionaries with segment info.
         video_title (str): Title for output files.
         output_dir (str): Output directory to store segments and files.
+        pool_workers (int): Concurrent ffmpeg processes (default: $V2R_FFMPEG_WORKERS or CPU count).
+        threads_per_invocation (int): Threads per ffmpeg process (default: $V2R_FFMPEG_THREADS
+            or CPU count divided by pool_workers).
+        save_json (bool): Also write the (keyframe-snapped) segments to generated/transcripts/segments.json.
+
+    Returns:
+        list: The segments, with start_time snapped to keyframes and duration updated to match.
     """
     os.makedirs(output_dir, exist_ok=True)
     segment_labels = []
 
-    # # Save segments to JSON
-    # json_path = os.path.join("generated/transcripts/segments.json")
-    # with open(json_path, 'w') as f:
-    #     json.dump(parsed_content, f, indent=4)
-    
-    # Load segments back (optional, remove if not needed)
-    with open("generated/transcripts/segments.json", 'r') as f:
-        parsed_content = json.load(f)
+    cpu_count = os.cpu_count() or 1
+    pool_workers = pool_workers or int(os.environ.get("V2R_FFMPEG_WORKERS", 0)) or cpu_count
+    threads_per_invocation = (threads_per_invocation
+                              or int(os.environ.get("V2R_FFMPEG_THREADS", 0))
+                              or max(1, cpu_count // pool_workers))
+
+    # Stream copy starts at a keyframe, so start each clip exactly on one. The clip
+    # gets longer by the same amount, and the last subtitle cue ends at its duration.
+    try:
+        keyframes = keyframe_times(filename)
+    except (OSError, subprocess.CalledProcessError) as e:
+        # Without ffprobe the clips are still cut, just starting at the requested times
+        print(f"Cannot read keyframes, clip starts are not snapped: {e}")
+        keyframes = []
+    for segment in parsed_content:
+        segment['start_time'] = snap_to_keyframe(keyframes, segment['start_time'])
+        segment['duration'] = segment['end_time'] - segment['start_time']
+
+    # Save segments to JSON
+    if save_json:
+        os.makedirs("generated/transcripts", exist_ok=True)
+        save_segment_to_json(parsed_content)
 
+    # Only errors are printed, and with stderr captured ffmpeg must not stop to ask before overwriting
+    base_cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    thread_args = ["-threads", str(threads_per_invocation)]
+    titles = [fileSafe(segment['yt_title']) for segment in parsed_content]
 
-    # Process each segment
-    for i, segment in enumerate(parsed_content):
-        start_time = segment['start_time']
-        end_time = segment['end_time']
-        yt_title = fileSafe(segment['yt_title'])
+    # Split segments into batches, one ffmpeg process per batch, spread over the pool
+    batch_size = min(SEGMENTS_PER_COMMAND, max(1, math.ceil(len(parsed_content) / pool_workers)))
+    commands = []
+    for batch_start in range(0, len(parsed_content), batch_size):
+        batch = parsed_content[batch_start:batch_start + batch_size]
+        command = list(base_cmd)
+        for segment in batch:
+            duration = segment['end_time'] - segment['start_time']
+            command += thread_args
+            command += ["-ss", str(segment['start_time']), "-t", str(duration), "-i", filename]
+        for index, title in enumerate(titles[batch_start:batch_start + batch_size]):
+            output_file = f"{output_dir}/{title}.mp4"
+            # First video and audio stream only, into one file per segment
+            command += ["-map", f"{index}:v:0", "-map", f"{index}:a:0?",
+                        "-c", "copy", "-avoid_negative_ts", "make_zero", output_file]
+        commands.append(command)
+
+    with ThreadPoolExecutor(max_workers=pool_workers) as executor:
+        returncodes = list(executor.map(run_ffmpeg, commands))
+    failed = sum(1 for code in returncodes if code != 0)
+    if failed:
+        print(f"{failed} of {len(commands)} ffmpeg batches failed")
+
+    for i, (segment, yt_title) in enumerate(zip(parsed_content, titles)):
         description = segment['description']
-        duration = segment['duration']
+        duration = round(segment['duration'], 2)
 
-        output_file = f"{output_dir}/{yt_title}.mp4"
-        command = f'ffmpeg -i "{filename}" -ss {start_time} -to {end_time} -c:v libx264 -c:a aac -strict experimental -b:a 192k "{output_file}"'
-        subprocess.call(command, shell=True)
         label = f"Sub-Topic {i+1}: {yt_title}, Duration: {duration}s\nDescription: {description}\n"
         segment_labels.append(label)
 
@@ -48,9 +123,11 @@ def generate_video_clips(filename, parsed_content, output_dir="generated/video")
         for label in segment_labels:
             f.write(label + "\n")
 
+    return parsed_content
+
 
 if __name__ == "__main__":
     # Example usage
-    with open("generated/transcripts/segments.json", 'r') as f:
-        parsed_content = json.load(f)
+    with open("generated/transcripts/segments.json", 'rb') as f:
+        parsed_content = orjson.loads(f.read())
     generate_video_clips('downloaded_videos/video.mp4', parsed_content)
@@ -1,7 +1,9 @@
 import os
+import asyncio
+import multiprocessing
+from functools import lru_cache, partial
 from dotenv import load_dotenv, find_dotenv
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from typing import List
 import json
 
@@ -12,17 +14,6 @@ import track_n_merge
 import video_downloader
 
 
-load_dotenv(find_dotenv())
-
-
-llm = ChatOpenAI(model='openai/gpt-4o-mini',
-                 temperature=0.7, 
-                 max_tokens=None,
-                 timeout=None,
-                 max_retries=2
-                 )
-
-
 class Segment(BaseModel):
     """ Represents a segment of a video"""
     start_time: float = Field(..., description="The start time of the segment in seconds")
@@ -36,6 +27,107 @@ class VideoTranscript(BaseModel):
     segments: List[Segment] = Field(..., description="List of viral segments in the video")
 
 
+@lru_cache(maxsize=None)
+def get_structured_llm():
+    """
+    The segmenting LLM, built on first use. The clip worker processes re-import this
+    module, so it must not pull in langchain or create a client at import time.
+    """
+    from langchain_openai import ChatOpenAI
+
+    load_dotenv(find_dotenv())
+    llm = ChatOpenAI(model='openai/gpt-4o-mini',
+                     temperature=0.7,
+                     max_tokens=None,
+                     timeout=None,
+                     max_retries=2
+                     )
+    return llm.with_structured_output(VideoTranscript)
+
+
+SYSTEM_PROMPT = "You are a viral content producer. You are master at reading youtube transcripts and identifying the most intriguing content. You have extraordinary skills to extract subtopic from content. Your subtopics can be repurposed as a separate video."
+
+# Transcript window sent per LLM call (~4 characters per token), and how much of the
+# end of one window is repeated at the start of the next so boundary topics aren't lost
+CHUNK_TOKENS = 4000
+CHUNK_OVERLAP_SECONDS = 60
+# Windows sent to the LLM at the same time
+MAX_CONCURRENT_REQUESTS = 8
+
+
+def chunk_transcript(entries, max_tokens=CHUNK_TOKENS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    Split transcript entries into windows of at most ~max_tokens, ending at a sentence
+    boundary where possible. Consecutive windows share overlap_seconds of transcript,
+    but at most half of a window, so short windows still advance through the transcript.
+    """
+    max_chars = max_tokens * 4
+    chunks = []
+    start = 0
+    while start < len(entries):
+        end, size, sentence_end = start, 0, None
+        while end < len(entries) and (end == start or size + len(str(entries[end])) <= max_chars):
+            size += len(str(entries[end]))
+            if entries[end]["text"].rstrip().endswith((".", "?", "!")):
+                sentence_end = end + 1
+            end += 1
+        if end < len(entries) and sentence_end is not None:
+            end = sentence_end
+        chunks.append(entries[start:end])
+        if end >= len(entries):
+            break
+        # Step back into the window for the overlap, but always move forward
+        overlap = min(overlap_seconds, (entries[end - 1]["start"] - entries[start]["start"]) / 2)
+        next_start = end
+        while next_start - 1 > start and entries[end - 1]["start"] - entries[next_start - 1]["start"] < overlap:
+            next_start -= 1
+        start = next_start
+    return chunks
+
+
+async def generate_segments(entries):
+    """Ask the LLM for viral segments in the transcript windows concurrently and merge the results."""
+    structured_llm = get_structured_llm()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def invoke(messages):
+        async with semaphore:
+            return await structured_llm.ainvoke(messages)
+
+    requests = []
+    for chunk in chunk_transcript(entries or []):
+        # prompts and message
+        prompt = f"""Provided to you is a transcript of a part of a video. 
+    Please identify all segments that can be extracted as 
+    subtopics from the video based on the transcript.
+    Make sure each segment is between 60-300 seconds in duration.
+    Make sure you provide extremely accruate timestamps
+    and respond only in the format provided. 
+    \n Here is the transcription : \n {chunk}"""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        requests.append(invoke(messages))
+    results = await asyncio.gather(*requests)
+
+    # Windows overlap, so drop segments that overlap one already kept
+    segments = sorted((segment.dict() for result in results for segment in result.segments),
+                      key=lambda segment: segment['start_time'])
+    merged = []
+    for segment in segments:
+        if not merged or segment['start_time'] >= merged[-1]['end_time']:
+            merged.append(segment)
+    return merged
+
+
+def _process_one(name, encode_threads=None):
+    """Face-track, crop and subtitle one generated clip (runs in a worker process)."""
+    with track_n_merge.FaceTrackingCropper(smoothing_factor=0.8, encode_threads=encode_threads) as cropper:
+        return cropper.process_video(f"generated/video/{name}.mp4",
+                                     f"generated/merged/{name}.mp4",
+                                     f"generated/subtitles/{name}.srt")
+
 
 if __name__ == "__main__":
 
@@ -65,32 +157,15 @@ if __name__ == "__main__":
 
 
     print("Generating segments...")
-    # prompts and message
-    prompt = f"""Provided to you is a transcript of a video. 
-    Please identify all segments that can be extracted as 
-    subtopics from the video based on the transcript.
-    Make sure each segment is between 60-300 seconds in duration.
-    Make sure you provide extremely accruate timestamps
-    and respond only in the format provided. 
-    \n Here is the transcription : \n {manager.load_transcript()}"""
-
-    messages = [
-        {"role": "system", "content": "You are a viral content producer. You are master at reading youtube transcripts and identifying the most intriguing content. You have extraordinary skills to extract subtopic from content. Your subtopics can be repurposed as a separate video."},
-        {"role": "user", "content": prompt}
-    ]
-    
     print("invoke LLM...")
-    structured_llm = llm.with_structured_output(VideoTranscript)
-    ai_msg = structured_llm.invoke(messages)
-
-    parsed_content = ai_msg.dict()['segments']
-    utils.save_segment_to_json(parsed_content)
+    parsed_content = asyncio.run(generate_segments(manager.load_transcript()))
 
     # with open("generated/transcripts/segments.json", 'r') as f:
     #     parsed_content = json.load(f)
     
     
-    clipper.generate_video_clips(filename, parsed_content)
+    # clip starts are moved to keyframes, persist them for the subtitle merge
+    parsed_content = clipper.generate_video_clips(filename, parsed_content, save_json=True)
     # manager.save_transcript()
     manager.load_segments("generated/transcripts/segments.json")
     manager.merge_segments_with_subtitles()
@@ -98,10 +173,14 @@ if __name__ == "__main__":
 
     names = utils.return_files_in_directory("generated/video")
 
-    cropper = track_n_merge.FaceTrackingCropper(smoothing_factor=0.8)
-        
-    for name in names:
-        success = cropper.process_video(f"generated/video/{name}.mp4",
-                                        f"generated/merged/{name}.mp4",
-                                        f"generated/subtitles/{name}.srt")
+    # One clip per process, each single-threaded inside, scales better than threading
+    # one clip. MediaPipe is not fork-safe, hence spawn; workers inherit OMP_NUM_THREADS.
+    # The cores are split between the workers' encodes too, x264 would start ~1.5x cores each.
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    cpu_count = os.cpu_count() or 1
+    pool_size = max(1, cpu_count // 2)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=pool_size) as pool:
+        results = pool.map(partial(_process_one, encode_threads=max(1, cpu_count // pool_size)), names)
+    print(f"✔ {sum(results)}/{len(names)} clips processed")
 
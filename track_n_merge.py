@@ -1,51 +1,486 @@
 import cv2
 import mediapipe as mp
+from mediapipe.tasks.python import BaseOptions, vision
 import numpy as np
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 import os
+import queue
 import subprocess
 import tempfile
+import threading
+
+from utils import keyframe_times
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the per-frame math then simply runs as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    import PyNvCodec as nvc
+except ImportError:  # VPF is optional, only needed for decoder="nvdec"
+    nvc = None
+
+
+@njit(cache=True, fastmath=True)
+def _smooth(prev_x: int, prev_y: int, cx: int, cy: int, s: float) -> Tuple[int, int]:
+    """Exponential smoothing of a new face center towards the previous one."""
+    return int(s * prev_x + (1 - s) * cx), int(s * prev_y + (1 - s) * cy)
+
+
+@njit(cache=True, fastmath=True)
+def _crop_region(w: int, h: int, cw: int, ch: int, cx: int, cy: int) -> Tuple[int, int, int, int]:
+    """cw x ch crop box (x1, y1, x2, y2) centered on (cx, cy), clamped to a w x h frame."""
+    x1 = max(0, min(w - cw, cx - cw // 2))
+    y1 = max(0, min(h - ch, cy - ch // 2))
+    return x1, y1, x1 + cw, y1 + ch
+
+
+def _warm_up_jit():
+    """Compile (or load from numba's cache) the per-frame helpers before the first frame needs them."""
+    _smooth(0, 0, 0, 0, 0.5)
+    _crop_region(2, 2, 2, 2, 1, 1)
+
+
+def _simplify_track(track: List[Tuple[float, int, int]], tolerance: float) -> List[Tuple[float, int, int]]:
+    """
+    Drop (time, x, y) samples that linear interpolation between their neighbours
+    already reproduces within tolerance pixels (Ramer-Douglas-Peucker).
+    """
+    keep = {0, len(track) - 1}
+    stack = [(0, len(track) - 1)]
+    while stack:
+        a, b = stack.pop()
+        ta, xa, ya = track[a]
+        tb, xb, yb = track[b]
+        worst, worst_idx = tolerance, None
+        for i in range(a + 1, b):
+            t, x, y = track[i]
+            f = (t - ta) / (tb - ta)
+            dist = max(abs(xa + (xb - xa) * f - x), abs(ya + (yb - ya) * f - y))
+            if dist > worst:
+                worst, worst_idx = dist, i
+        if worst_idx is not None:
+            keep.add(worst_idx)
+            stack += [(a, worst_idx), (worst_idx, b)]
+    return [track[i] for i in sorted(keep)]
+
+
+def _linear_piece(t0: float, v0: int, t1: float, v1: int) -> str:
+    """ffmpeg expression of t going linearly from v0 at t0 to v1 at t1."""
+    if v0 == v1 or t1 <= t0:
+        return str(v0)
+    return f"{v0}+({(v1 - v0) / (t1 - t0):.4f})*(t-{t0:.4f})"
+
+
+def _sendcmd_script(track: List[Tuple[float, int, int]]) -> str:
+    """
+    sendcmd script that moves the crop@track filter along the (time, x1, y1) track.
+    Each command only holds the linear piece up to the next point, so ffmpeg evaluates
+    a tiny expression per frame however long the track is.
+    """
+    lines = []
+    for (t0, x0, y0), (t1, x1, y1) in zip(track, track[1:] + track[-1:]):
+        lines.append(f"{t0:.4f} crop@track x '{_linear_piece(t0, x0, t1, x1)}', "
+                     f"crop@track y '{_linear_piece(t0, y0, t1, y1)}';")
+    return "\n".join(lines) + "\n"
+
+
+def _filter_path(path: str) -> str:
+    """path quoted as a filter option value in an ffmpeg filtergraph, so Windows paths (C:\\...) and colons survive."""
+    path = path.replace("\\", "/").replace(":", "\\:").replace("'", "'\\\\\\''")
+    return f"'{path}'"
+
+
+def _cuda_available() -> bool:
+    """Whether this OpenCV build can decode and process video on a CUDA device."""
+    return hasattr(cv2, "cudacodec") and cv2.cuda.getCudaEnabledDeviceCount() > 0
+
+
+def _frame_size(frame) -> Tuple[int, int]:
+    """(height, width) of a host ndarray or a cv2.cuda.GpuMat frame."""
+    if isinstance(frame, np.ndarray):
+        return frame.shape[:2]
+    w, h = frame.size()
+    return h, w
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put item into a bounded queue, giving up once stop is set. Returns whether it was put."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _read_frames(cap: cv2.VideoCapture, read_q: queue.Queue, stop: threading.Event, failed: threading.Event):
+    """
+    Reader thread: decode (index, frame, proxy) items into read_q, then a None sentinel.
+    The sentinel is always sent; if decoding raised, failed is set first.
+    """
+    try:
+        idx = 0
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret or not _put(read_q, (idx, frame, None), stop):
+                break
+            idx += 1
+    except Exception as e:
+        print(f"Frame reader error: {e}")
+        failed.set()
+    finally:
+        _put(read_q, None, stop)
+
+
+def _read_frames_cuda(reader, read_q: queue.Queue, stop: threading.Event, failed: threading.Event,
+                      proxy_size: Tuple[int, int]):
+    """
+    Reader thread for the CUDA path: frames are decoded by NVDEC and stay on the GPU,
+    only a proxy_size (width, height) proxy for face detection is downloaded to the host.
+    Ends like _read_frames().
+    """
+    try:
+        idx = 0
+        while not stop.is_set():
+            ret, gpu_frame = reader.nextFrame()
+            if not ret:
+                break
+            frame = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGRA2BGR)
+            proxy = cv2.cuda.resize(frame, proxy_size, interpolation=cv2.INTER_AREA).download()
+            if not _put(read_q, (idx, frame, proxy), stop):
+                break
+            idx += 1
+    except Exception as e:
+        print(f"Frame reader error: {e}")
+        failed.set()
+    finally:
+        _put(read_q, None, stop)
+
+
+def _read_frames_nvdec(decoder, read_q: queue.Queue, stop: threading.Event, failed: threading.Event,
+                       proxy_size: Tuple[int, int], gpu_id: int):
+    """
+    Reader thread for decoder="nvdec": the PyNvDecoder decodes on NVDEC and VPF converts
+    to BGR on the GPU. The detection proxy is resized from the decoded NV12 surface, so
+    only the small image is converted for it. Ends like _read_frames().
+    """
+    try:
+        w, h = decoder.Width(), decoder.Height()
+        pw, ph = proxy_size
+        cc_ctx = nvc.ColorspaceConversionContext(nvc.ColorSpace.BT_709, nvc.ColorRange.MPEG)
+        to_yuv = nvc.PySurfaceConverter(w, h, nvc.PixelFormat.NV12, nvc.PixelFormat.YUV420, gpu_id)
+        to_bgr = nvc.PySurfaceConverter(w, h, nvc.PixelFormat.YUV420, nvc.PixelFormat.BGR, gpu_id)
+        download = nvc.PySurfaceDownloader(w, h, nvc.PixelFormat.BGR, gpu_id)
+        resize = nvc.PySurfaceResizer(pw, ph, nvc.PixelFormat.NV12, gpu_id)
+        proxy_to_yuv = nvc.PySurfaceConverter(pw, ph, nvc.PixelFormat.NV12, nvc.PixelFormat.YUV420, gpu_id)
+        proxy_to_bgr = nvc.PySurfaceConverter(pw, ph, nvc.PixelFormat.YUV420, nvc.PixelFormat.BGR, gpu_id)
+        download_proxy = nvc.PySurfaceDownloader(pw, ph, nvc.PixelFormat.BGR, gpu_id)
+
+        idx = 0
+        while not stop.is_set():
+            surface = decoder.DecodeSingleSurface()
+            if surface.Empty():
+                break
+            frame = np.empty(h * w * 3, np.uint8)
+            proxy = np.empty(ph * pw * 3, np.uint8)
+            bgr = to_bgr.Execute(to_yuv.Execute(surface, cc_ctx), cc_ctx)
+            small = proxy_to_bgr.Execute(proxy_to_yuv.Execute(resize.Execute(surface), cc_ctx), cc_ctx)
+            if not (download.DownloadSingleSurface(bgr, frame)
+                    and download_proxy.DownloadSingleSurface(small, proxy)):
+                break
+            if not _put(read_q, (idx, frame.reshape(h, w, 3), proxy.reshape(ph, pw, 3)), stop):
+                break
+            idx += 1
+    except Exception as e:
+        print(f"Frame reader error: {e}")
+        failed.set()
+    finally:
+        _put(read_q, None, stop)
+
+
+def _write_frames(write_q: queue.Queue, proc: subprocess.Popen, broken: threading.Event):
+    """
+    Writer thread: pipe C-contiguous frames from write_q into ffmpeg's stdin until a None sentinel.
+    If ffmpeg exits early, broken is set and the queue is still drained so the producer never blocks.
+    """
+    try:
+        while (frame := write_q.get()) is not None:
+            if not broken.is_set():
+                try:
+                    proc.stdin.write(frame)
+                except BrokenPipeError:
+                    broken.set()
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            broken.set()
 
 
 class FaceTrackingCropper:
-    def __init__(self, smoothing_factor: float = 0.8):
-        self.mp_face_detection = mp.solutions.face_detection
-        self.face_detection = self.mp_face_detection.FaceDetection(
-            model_selection=1,
-            min_detection_confidence=0.5
-        )
+    __slots__ = (
+        # Face detector
+        'detector', '_face_detection', '_detector_model', '_detector_size', '_timestamp_ms',
+        # Smoothed face tracking
+        'smoothing_factor', 'last_center_x', 'last_center_y', '_target_x', '_target_y',
+        'detect_every', 'min_track_score', 'motion_threshold', '_frame_idx', '_last_score', '_last_small',
+        # Sampled crop track
+        'track_sample_rate', 'min_track_coverage', 'max_keyframe_gap',
+        # Detection proxy
+        'detect_width', '_small_buf', '_rgb_buf',
+        # Decoding and encoding
+        'use_cuda', 'decoder', 'gpu_id', 'encoder', 'encode_threads', 'burn_subtitles',
+        # Per-video geometry, see _set_geometry()
+        '_frame_w', '_frame_h', '_crop_w', '_crop_h', '_proxy_w', '_proxy_h',
+    )
+
+    def __init__(self, smoothing_factor: float = 0.8, detect_every: int = 5,
+                 min_track_score: float = 0.6, motion_threshold: float = 3.0,
+                 track_sample_rate: float = 5.0, min_track_coverage: float = 0.6,
+                 detect_width: int = 320, use_cuda: bool = False,
+                 detector: str = "mediapipe", yunet_model: str = "face_detection_yunet_2023mar.onnx",
+                 max_keyframe_gap: float = 1.0, mediapipe_model: Optional[str] = None,
+                 decoder: str = "opencv", gpu_id: int = 0, encoder: str = "libx264",
+                 burn_subtitles: bool = True, encode_threads: Optional[int] = None):
+        """
+        Args:
+            smoothing_factor: Controls smoothness of tracking (0.0 = no smoothing, 1.0 = maximum smoothing)
+            detect_every: Run face detection at most once every N frames while a face is tracked
+            min_track_score: Detections scoring below this are re-checked on the very next frame
+            motion_threshold: Mean absolute difference (0-255) of a 64x64 grayscale thumbnail
+                below which a frame counts as unchanged since the last detection
+            track_sample_rate: Face detections per second when building the ffmpeg crop track
+            min_track_coverage: Fraction of track samples that must contain a face, otherwise
+                process_video falls back to cropping frame by frame
+            detect_width: Frames are downscaled so their longer side is at most this many
+                pixels before face detection
+            use_cuda: Decode, convert, downscale and crop on the GPU (needs OpenCV built with CUDA)
+            decoder: "opencv" or "nvdec", which decodes and color converts frames with NVIDIA's
+                Video Processing Framework (PyNvCodec) when tracking every frame
+            gpu_id: CUDA device used by the "nvdec" decoder
+            encoder: "libx264" or "nvenc" (h264_nvenc, needs an NVIDIA GPU) for the final encode
+            burn_subtitles: Render the subtitles into the picture, or mux them as a selectable
+                mov_text track when False (the crop still has to be encoded either way)
+            encode_threads: libx264 threads per encode (default: libx264's own choice, ~1.5x the
+                cores); set it when several croppers run at once so they don't oversubscribe the CPU
+            detector: "mediapipe" (BlazeFace) or "yunet" (OpenCV's FaceDetectorYN, lighter on the CPU)
+            yunet_model: Path to the YuNet ONNX model, used when detector is "yunet"
+            mediapipe_model: Path to a BlazeFace short range .tflite model, used when detector is
+                "mediapipe" (default: the one bundled with the mediapipe package)
+            max_keyframe_gap: Build the crop track from keyframes alone when they are at most
+                this many seconds apart, otherwise sample decoded frames at track_sample_rate
+        """
+        # Parallelism comes from processing clips in separate processes (see main.py),
+        # OpenCV's own thread pool would only oversubscribe the cores MediaPipe uses
+        cv2.setNumThreads(1)
+        os.environ.setdefault("OMP_NUM_THREADS", "1")
+        _warm_up_jit()
+
+        self.detector = detector
+        if detector == "yunet":
+            if not os.path.exists(yunet_model):
+                raise FileNotFoundError(f"YuNet model not found: {yunet_model}")
+            self._detector_model = yunet_model
+        else:
+            if mediapipe_model is None:
+                mediapipe_model = os.path.join(os.path.dirname(mp.__file__), "modules", "face_detection",
+                                               "face_detection_short_range.tflite")
+            self._detector_model = mediapipe_model
+        # Loaded on first use, see the face_detection property
+        self._face_detection = None
+        self._detector_size = None
+        self._timestamp_ms = 0
         self.smoothing_factor = smoothing_factor
         self.last_center_x = None
         self.last_center_y = None
+        # Latest raw detection, the center eases towards it on every frame
+        self._target_x = None
+        self._target_y = None
+
+        self.detect_every = detect_every
+        self.min_track_score = min_track_score
+        self.motion_threshold = motion_threshold
+        self._frame_idx = -1
+        self._last_score = 0.0
+        self._last_small = None
+
+        self.track_sample_rate = track_sample_rate
+        self.min_track_coverage = min_track_coverage
+        self.max_keyframe_gap = max_keyframe_gap
+
+        self.detect_width = detect_width
+        self._small_buf = None
+        self._rgb_buf = None
+
+        self.use_cuda = use_cuda and _cuda_available()
+        if use_cuda and not self.use_cuda:
+            print("CUDA not available in this OpenCV build, using the CPU")
+
+        self.gpu_id = gpu_id
+        self.decoder = decoder
+        if decoder == "nvdec" and nvc is None:
+            print("PyNvCodec not installed, decoding with OpenCV")
+            self.decoder = "opencv"
+        self.encoder = encoder
+        self.encode_threads = encode_threads
+        self.burn_subtitles = burn_subtitles
+
+        # Frame and crop dimensions of the current video, see _set_geometry()
+        self._frame_w = self._frame_h = self._crop_w = self._crop_h = 0
+        self._proxy_w = self._proxy_h = 0
+
+    @property
+    def face_detection(self):
+        """The face detector, loaded on first use so croppers that never detect don't pay for the model."""
+        if self._face_detection is None:
+            if self.detector == "yunet":
+                self._face_detection = cv2.FaceDetectorYN.create(self._detector_model, "", (320, 320),
+                                                                 score_threshold=0.6)
+                self._detector_size = (320, 320)
+            else:
+                # MediaPipe Tasks runs the model through TFLite's XNNPACK CPU kernels
+                self._face_detection = vision.FaceDetector.create_from_options(vision.FaceDetectorOptions(
+                    base_options=BaseOptions(model_asset_path=self._detector_model,
+                                             delegate=BaseOptions.Delegate.CPU),
+                    running_mode=vision.RunningMode.VIDEO,
+                    min_detection_confidence=0.5
+                ))
+        return self._face_detection
+
+    def close(self):
+        """Release the face detector. The cropper stays usable, the detector is reloaded when needed."""
+        if self._face_detection is not None and hasattr(self._face_detection, "close"):
+            self._face_detection.close()
+        self._face_detection = None
+        self._detector_size = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _reset_tracking(self):
+        """Forget the tracked face, so state does not leak from one video into the next."""
+        self.last_center_x = None
+        self.last_center_y = None
+        self._target_x = None
+        self._target_y = None
+        self._frame_idx = -1
+        self._last_score = 0.0
+        self._last_small = None
+
+    def _detect(self, frame, proxy: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, float]]:
+        """
+        Run face detection, returning (center_x, center_y, score) of the first face or None.
+        A ready-made downscaled proxy of the frame is used as-is when given.
+        """
+        # Both detectors work on a tiny input anyway; shrink before anything else.
+        # The result is relative, so it maps back onto the full frame unchanged.
+        small = frame if proxy is None else proxy
+        if proxy is None and self._small_buf is not None:
+            small = cv2.resize(frame, (self._proxy_w, self._proxy_h), dst=self._small_buf,
+                               interpolation=cv2.INTER_AREA)
 
-    def get_face_center(self, frame: np.ndarray) -> Tuple[int, int]:
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_detection.process(rgb_frame)
+        detection = self._detect_relative(small)
+        if detection is None:
+            return None
 
-        if results.detections:
-            detection = results.detections[0]
-            bbox = detection.location_data.relative_bounding_box
-            h, w = frame.shape[:2]
-            cx = int((bbox.xmin + bbox.width / 2) * w)
-            cy = int((bbox.ymin + bbox.height / 2) * h)
+        rel_x, rel_y, score = detection
+        return int(rel_x * self._frame_w), int(rel_y * self._frame_h), score
 
-            if self.last_center_x is not None and self.last_center_y is not None:
-                cx = int(self.smoothing_factor * self.last_center_x + (1 - self.smoothing_factor) * cx)
-                cy = int(self.smoothing_factor * self.last_center_y + (1 - self.smoothing_factor) * cy)
+    def _detect_relative(self, small: np.ndarray, rgb: bool = False) -> Optional[Tuple[float, float, float]]:
+        """
+        Run the configured detector on a proxy, returning the relative (center_x, center_y, score) or None.
+        The proxy is BGR, or RGB if rgb is set, which only the mediapipe detector accepts.
+        """
+        if self.detector == "yunet":
+            return self._detect_yunet(small)
+        return self._detect_mediapipe(small, rgb)
+
+    def _detect_mediapipe(self, small: np.ndarray, rgb: bool = False) -> Optional[Tuple[float, float, float]]:
+        """BlazeFace on a BGR (or contiguous RGB) proxy, returning the relative (center_x, center_y, score) or None."""
+        # cvtColor into the reused buffer beats any NumPy channel swap by an order of magnitude
+        if not rgb:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        # VIDEO mode only requires increasing timestamps, and one detector serves many videos,
+        # so count calls instead of using the position in the current video
+        self._timestamp_ms += 1
+        results = self.face_detection.detect_for_video(
+            mp.Image(image_format=mp.ImageFormat.SRGB, data=small), self._timestamp_ms)
+        if not results.detections:
+            return None
 
-            self.last_center_x = cx
-            self.last_center_y = cy
-            return cx, cy
+        detection = results.detections[0]
+        bbox = detection.bounding_box
+        sh, sw = small.shape[:2]
+        return ((bbox.origin_x + bbox.width / 2) / sw, (bbox.origin_y + bbox.height / 2) / sh,
+                detection.categories[0].score)
 
-        if self.last_center_x is not None and self.last_center_y is not None:
+    def _detect_yunet(self, small: np.ndarray) -> Optional[Tuple[float, float, float]]:
+        """YuNet on a BGR proxy (no color conversion needed), returning the relative (center_x, center_y, score) or None."""
+        sh, sw = small.shape[:2]
+        if self._detector_size != (sw, sh):
+            self.face_detection.setInputSize((sw, sh))
+            self._detector_size = (sw, sh)
+        _, faces = self.face_detection.detect(small)
+        if faces is None or len(faces) == 0:
+            return None
+
+        # Rows are x, y, w, h, five landmarks, score
+        x, y, fw, fh = faces[faces[:, -1].argmax(), :4]
+        return (x + fw / 2) / sw, (y + fh / 2) / sh, float(faces[:, -1].max())
+
+    def _is_tracked(self, frame: np.ndarray) -> bool:
+        """Whether detection can be skipped for this frame, the last detection still being good."""
+        if self.last_center_x is None or self._last_score < self.min_track_score:
+            self._last_small = None
+            return False
+        if self._frame_idx % self.detect_every:
+            return True
+        # Detection is due, skip it anyway if the picture hasn't changed since the last one
+        small = cv2.cvtColor(cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self._last_small is not None:
+            diff = cv2.norm(small, self._last_small, cv2.NORM_L1) / small.size
+            if diff < self.motion_threshold:
+                return True
+        self._last_small = small
+        return False
+
+    def get_face_center(self, frame, proxy: Optional[np.ndarray] = None) -> Tuple[int, int]:
+        """
+        Smoothed face center for this frame. Detection only runs when _is_tracked() says so;
+        on the frames in between the center keeps easing towards the last detection, so the
+        crop moves smoothly instead of jumping once every detect_every frames.
+        """
+        self._frame_idx += 1
+        if not self._is_tracked(frame if proxy is None else proxy):
+            detection = self._detect(frame, proxy)
+            if detection is not None:
+                self._target_x, self._target_y, self._last_score = detection
+                if self.last_center_x is None:
+                    self.last_center_x, self.last_center_y = self._target_x, self._target_y
+            else:
+                self._last_score = 0.0
+
+        if self._target_x is not None:
+            self.last_center_x, self.last_center_y = _smooth(self.last_center_x, self.last_center_y,
+                                                             self._target_x, self._target_y,
+                                                             self.smoothing_factor)
             return self.last_center_x, self.last_center_y
 
-        h, w = frame.shape[:2]
+        h, w = _frame_size(frame)
         return w // 2, h // 2
 
-    def calculate_crop_region(self, frame: np.ndarray, face_center: Tuple[int, int]) -> Tuple[int, int, int, int]:
-        h, w = frame.shape[:2]
-        cx, cy = face_center
+    @staticmethod
+    def _crop_size(w: int, h: int) -> Tuple[int, int]:
+        """Largest 9:16 (width, height) that fits in a w x h frame."""
         aspect = 9 / 16
 
         if w / h < aspect:
@@ -54,14 +489,177 @@ class FaceTrackingCropper:
         else:
             ch = h
             cw = int(h * aspect)
+        # libx264 needs even dimensions for yuv420p output
+        return cw - cw % 2, ch - ch % 2
+
+    def _set_geometry(self, w: int, h: int):
+        """Cache the frame, crop and detection proxy dimensions, they are constant for the whole video."""
+        self._frame_w, self._frame_h = w, h
+        self._crop_w, self._crop_h = self._crop_size(w, h)
 
-        x1 = max(0, min(w - cw, cx - cw // 2))
-        y1 = max(0, min(h - ch, cy - ch // 2))
-        return x1, y1, x1 + cw, y1 + ch
+        scale = min(1.0, self.detect_width / max(w, h))
+        self._proxy_w, self._proxy_h = max(1, round(w * scale)), max(1, round(h * scale))
+        self._small_buf = np.empty((self._proxy_h, self._proxy_w, 3), np.uint8) if scale < 1 else None
+        # MediaPipe wants RGB, converted into this buffer on every detection
+        if self.detector != "yunet":
+            self._rgb_buf = np.empty((self._proxy_h, self._proxy_w, 3), np.uint8)
+
+    def calculate_crop_region(self, face_x: int, face_y: int) -> Tuple[int, int, int, int]:
+        """Crop box (x1, y1, x2, y2) centered on the face, for the frame size passed to _set_geometry()."""
+        return _crop_region(self._frame_w, self._frame_h, self._crop_w, self._crop_h, face_x, face_y)
+
+    def _sample_keyframes(self, input_path: str, duration: float) -> Optional[List[Tuple[float, Optional[Tuple[int, int, float]]]]]:
+        """
+        Detect the face on the keyframes only, which ffmpeg decodes without touching the
+        frames in between, downscaled to the detection proxy size.
+
+        Returns:
+            List of (time, detection) samples, or None if keyframes are too sparse to track with
+        """
+        try:
+            times = keyframe_times(input_path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Cannot read keyframes: {e}")
+            return None
+        gaps = [b - a for a, b in zip(times, times[1:])] + [duration - times[-1]] if times else []
+        if not gaps or max(gaps) > self.max_keyframe_gap:
+            return None
+
+        sw, sh = self._proxy_w, self._proxy_h
+        # ffmpeg converts from YUV anyway, so let it produce the channel order the detector wants
+        rgb = self.detector != "yunet"
+        ffmpeg_cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-skip_frame', 'nokey', '-i', input_path,
+            '-map', '0:v:0', '-vf', f'scale={sw}:{sh}', '-vsync', '0',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24' if rgb else 'bgr24', '-'
+        ]
+        proc = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE)
+        samples = []
+        frame_bytes = sw * sh * 3
+        for t in times:
+            data = proc.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            small = np.frombuffer(data, np.uint8).reshape(sh, sw, 3)
+            detection = self._detect_relative(small, rgb)
+            if detection is not None:
+                detection = (int(detection[0] * self._frame_w), int(detection[1] * self._frame_h), detection[2])
+            samples.append((t, detection))
+        proc.stdout.close()
+        proc.wait()
+        return samples
+
+    def _sample_face_track(self, cap: cv2.VideoCapture, fps: float) -> List[Tuple[float, Optional[Tuple[int, int, float]]]]:
+        """
+        Detect the face on track_sample_rate decoded frames per second.
+
+        Returns:
+            List of (time, detection) samples
+        """
+        step = max(1, round(fps / self.track_sample_rate))
+        samples = []
+        frame_idx = 0
+        while True:
+            if frame_idx % step == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                samples.append((frame_idx / fps, self._detect(frame)))
+            elif not cap.grab():
+                break
+            frame_idx += 1
+        return samples
+
+    def _build_track(self, samples: List[Tuple[float, Optional[Tuple[int, int, float]]]],
+                     fps: float) -> Optional[List[Tuple[float, int, int]]]:
+        """
+        Smooth sampled face detections into crop offsets.
+
+        Returns:
+            List of (time, crop_x1, crop_y1) samples, or None if too few samples contained a face
+        """
+        detected = [d for _, d in samples if d is not None]
+        if not samples or len(detected) / len(samples) < self.min_track_coverage:
+            return None
+
+        cx, cy = detected[0][:2]
+        prev_t = samples[0][0]
+        track = []
+        for t, detection in samples:
+            if detection is not None:
+                # Same amount of smoothing as applying smoothing_factor on every frame in between
+                alpha = self.smoothing_factor ** max(1.0, (t - prev_t) * fps)
+                cx, cy = _smooth(cx, cy, detection[0], detection[1], alpha)
+            prev_t = t
+            x1, y1, _, _ = self.calculate_crop_region(cx, cy)
+            track.append((t, x1, y1))
+        return track
+
+    def _encoder_args(self) -> List[str]:
+        """ffmpeg video encoder options shared by both output paths."""
+        if self.encoder == "nvenc":
+            # Offline batch encode, so tune for quality rather than latency
+            return ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'hq', '-rc', 'vbr', '-cq', '20']
+        args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20']
+        if self.encode_threads:
+            args += ['-threads', str(self.encode_threads)]
+        return args
+
+    def _soft_subtitle_args(self, subtitle_path: str, input_index: int) -> Tuple[List[str], List[str]]:
+        """(input, output) ffmpeg arguments muxing subtitle_path as a mov_text track, empty when burning in."""
+        if self.burn_subtitles:
+            return [], []
+        return ['-i', subtitle_path], ['-map', f'{input_index}:0', '-c:s', 'mov_text']
+
+    def _crop_with_ffmpeg(self, input_path: str, output_path: str, subtitle_path: str,
+                          track: List[Tuple[float, int, int]], out_width: int, out_height: int) -> bool:
+        """Crop along the sampled track, burn subtitles and copy the audio in a single ffmpeg pass."""
+        track = _simplify_track(track, tolerance=2)
+        with tempfile.NamedTemporaryFile('w', suffix='.cmd', delete=False) as f:
+            f.write(_sendcmd_script(track))
+            script_path = f.name
+
+        _, x0, y0 = track[0]
+        video_filter = f"sendcmd=f={_filter_path(script_path)},crop@track=w={out_width}:h={out_height}:x={x0}:y={y0}"
+        if self.burn_subtitles:
+            video_filter += f",subtitles={_filter_path(subtitle_path)}"
+        sub_inputs, sub_outputs = self._soft_subtitle_args(subtitle_path, 1)
+        ffmpeg_cmd = ['ffmpeg', '-y']
+        if self.use_cuda:
+            ffmpeg_cmd += ['-hwaccel', 'cuda']
+        ffmpeg_cmd += [
+            '-i', input_path,
+            *sub_inputs,
+            '-vf', video_filter,
+            '-map', '0:v:0',
+            '-map', '0:a:0?',
+            *sub_outputs,
+            *self._encoder_args(),
+            '-c:a', 'copy',
+            output_path
+        ]
+
+        try:
+            subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"FFmpeg error: {e}")
+            print(f"stderr: {e.stderr}")
+            return False
+        finally:
+            os.remove(script_path)
+
+        print(f"✔ Final output: {output_path}")
+        return True
 
     def process_video(self, input_path: str, output_path: str, subtitle_path: str) -> bool:
         """
         Process video with face tracking crop and preserve audio.
+
+        The face is detected on the keyframes (or, if they are too far apart, on a few
+        decoded frames per second) and ffmpeg crops along the interpolated track in one
+        pass. If too few samples contain a face, every frame is tracked and cropped
+        individually instead.
         """
         if not os.path.exists(input_path):
             print(f"Input file not found: {input_path}")
@@ -76,86 +674,164 @@ class FaceTrackingCropper:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         print(f"Processing {total_frames} frames ({fps:.2f} FPS)")
+        self._reset_tracking()
+        self._set_geometry(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
 
-        # Create temporary file for video without audio
-        temp_video = tempfile.mktemp(suffix='.mp4')
-        
-        # Get first frame to determine output dimensions
-        ret, first_frame = cap.read()
-        if not ret:
+        if fps <= 0:
+            # Some containers don't report a frame rate, without it there is no time axis for a track
+            print("Frame rate unknown, tracking every frame...")
+            return self._process_frames(cap, input_path, output_path, subtitle_path)
+
+        samples = self._sample_keyframes(input_path, total_frames / fps)
+        decoded = samples is None
+        if decoded:
+            samples = self._sample_face_track(cap, fps)
+        track = self._build_track(samples, fps)
+        if track is not None:
             cap.release()
-            return False
-        
-        center = self.get_face_center(first_frame)
-        x1, y1, x2, y2 = self.calculate_crop_region(first_frame, center)
-        out_width = x2 - x1
-        out_height = y2 - y1
-        
-        print(f"Output dimensions: {out_width}x{out_height}")
-        
-        # Setup video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(temp_video, fourcc, fps, (out_width, out_height))
-        
-        # Reset to beginning
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        frame_idx = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            center = self.get_face_center(frame)
-            x1, y1, x2, y2 = self.calculate_crop_region(frame, center)
-            
-            # Crop the frame
-            cropped = frame[y1:y2, x1:x2]
-            
-            # Resize if dimensions don't match (edge case)
-            if cropped.shape[:2] != (out_height, out_width):
-                cropped = cv2.resize(cropped, (out_width, out_height))
-            
-            out.write(cropped)
-            
-            frame_idx += 1
-            if frame_idx % 50 == 0:
-                print(f"  -> {frame_idx}/{total_frames} frames processed")
-        
-        cap.release()
-        out.release()
-        
-        print("✔ Video processing complete, adding audio...")
-        # Combine cropped video with original audio using FFmpeg
-        ffmpeg_cmd = [
-            'ffmpeg', '-y',  # -y to overwrite output file
-            '-i', temp_video,  # cropped video
-            '-i', input_path,  # original video (for audio)
-            '-vf', f'subtitles={subtitle_path}',  # add subtitles filter
-            '-c:v', 'libx264',  # video codec
-            '-c:a', 'aac',      # audio codec
-            '-map', '0:v:0',    # video from first input
-            '-map', '1:a:0',    # audio from second input
-            '-shortest',        # match shortest stream
-            output_path
-        ]
-        
+            print(f"Output dimensions: {self._crop_w}x{self._crop_h}, cropping with ffmpeg...")
+            return self._crop_with_ffmpeg(input_path, output_path, subtitle_path, track, self._crop_w, self._crop_h)
+
+        print("Face not found reliably, tracking every frame...")
+        if decoded:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self._process_frames(cap, input_path, output_path, subtitle_path)
+
+    def _open_nvdec(self, input_path: str):
+        """
+        PyNvDecoder for input_path when decoder="nvdec", else None. If it cannot be created
+        (no CUDA device, unsupported codec, ...) the cropper falls back to OpenCV for good.
+        """
+        if self.decoder != "nvdec":
+            return None
         try:
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
-            print("✔ Audio merged successfully")
-        except subprocess.CalledProcessError as e:
-            print(f"FFmpeg error: {e}")
-            print(f"stderr: {e.stderr}")
-            return False
+            return nvc.PyNvDecoder(input_path, self.gpu_id)
+        except Exception as e:
+            print(f"NVDEC not available ({e}), decoding with OpenCV")
+            self.decoder = "opencv"
+            return None
+
+    def _process_frames(self, cap: cv2.VideoCapture, input_path: str, output_path: str, subtitle_path: str) -> bool:
+        """
+        Track and crop every frame with OpenCV, piping the crops into ffmpeg to encode with subtitles and audio.
+        cap must be positioned at the first frame and _set_geometry() already called for the video.
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        # Decode, track and encode on three threads so the stages overlap.
+        # Face tracking stays on this thread since the cropper is stateful. If it stops
+        # early, stop tells the reader to quit instead of blocking on a full queue.
+        read_q = queue.Queue(maxsize=8)
+        write_q = queue.Queue(maxsize=8)
+        stop = threading.Event()
+        failed = threading.Event()
+        if self.use_cuda:
+            cap.release()
+            cap = cv2.cudacodec.createVideoReader(input_path)
+            reader = threading.Thread(target=_read_frames_cuda,
+                                      args=(cap, read_q, stop, failed, (self._proxy_w, self._proxy_h)), daemon=True)
+        elif (nv_decoder := self._open_nvdec(input_path)) is not None:
+            cap.release()
+            reader = threading.Thread(target=_read_frames_nvdec,
+                                      args=(nv_decoder, read_q, stop, failed, (self._proxy_w, self._proxy_h), self.gpu_id),
+                                      daemon=True)
+        else:
+            reader = threading.Thread(target=_read_frames, args=(cap, read_q, stop, failed), daemon=True)
+        broken = threading.Event()
+        writer = None
+        proc = None
+        reader.start()
+
+        try:
+            item = read_q.get()
+            if item is None:
+                print(f"No frames decoded from {input_path}")
+                return False
+
+            # The geometry came from container metadata; the decoded frames are what counts
+            frame_h, frame_w = _frame_size(item[1])
+            if (frame_h, frame_w) != (self._frame_h, self._frame_w):
+                print(f"Decoded frames are {frame_w}x{frame_h}, not {self._frame_w}x{self._frame_h} as reported")
+                self._set_geometry(frame_w, frame_h)
+            out_width, out_height = self._crop_w, self._crop_h
+
+            print(f"Output dimensions: {out_width}x{out_height}")
+
+            # Raw cropped frames come in on stdin, audio from the original video
+            sub_inputs, sub_outputs = self._soft_subtitle_args(subtitle_path, 2)
+            burn_filter = ['-vf', f'subtitles={_filter_path(subtitle_path)}'] if self.burn_subtitles else []
+            ffmpeg_cmd = [
+                'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+                '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+                '-s', f'{out_width}x{out_height}',
+                *(['-r', str(fps)] if fps > 0 else []),  # ffmpeg assumes 25 FPS when unknown
+                '-i', '-',          # cropped frames
+                '-i', input_path,   # original video (for audio)
+                *sub_inputs,        # subtitle file, unless burned in
+                *burn_filter,       # add subtitles filter
+                '-map', '0:v:0',    # video from first input
+                '-map', '1:a:0?',   # audio from second input, if it has any
+                *sub_outputs,
+                *self._encoder_args(),
+                '-pix_fmt', 'yuv420p',  # raw input is bgr24, keep the output playable everywhere
+                '-c:a', 'copy',     # audio passes through untouched
+                # No -shortest: audio and frames come from the same clip, and a muxed subtitle
+                # track would otherwise cut the reel at its last cue
+                output_path
+            ]
+            proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE)
+            writer = threading.Thread(target=_write_frames, args=(write_q, proc, broken), daemon=True)
+            writer.start()
+
+            # A crop spanning whole rows is already contiguous and is piped as a view. Otherwise
+            # crops are copied into a ring of buffers, one more than the writer can be holding.
+            # Every frame has the size checked above, so crops always come out exactly
+            # out_width x out_height: _crop_region() clamps the box inside the frame.
+            full_width = out_width == self._frame_w
+            crop_bufs = [np.empty((out_height, out_width, 3), np.uint8) for _ in range(write_q.maxsize + 2)]
+            n_bufs = len(crop_bufs)
+            on_gpu = self.use_cuda
+
+            while item is not None and not broken.is_set():
+                frame_idx, frame, proxy = item
+                center = self.get_face_center(frame, proxy)
+                x1, y1, x2, y2 = self.calculate_crop_region(*center)
+
+                # Crop the frame, on the GPU only the cropped region is downloaded
+                if on_gpu:
+                    cropped = cv2.cuda_GpuMat(frame, (x1, y1, x2 - x1, y2 - y1)).download()
+                elif full_width:
+                    cropped = frame[y1:y2]
+                else:
+                    cropped = crop_bufs[frame_idx % n_bufs]
+                    np.copyto(cropped, frame[y1:y2, x1:x2])
+
+                write_q.put(cropped)
+
+                if (frame_idx + 1) % 50 == 0:
+                    print(f"  -> {frame_idx + 1}/{total_frames} frames processed")
+                item = read_q.get()
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_video):
-                os.remove(temp_video)
-        
+            stop.set()
+            if writer is not None:
+                write_q.put(None)
+                writer.join()
+            reader.join()
+            if isinstance(cap, cv2.VideoCapture):
+                cap.release()
+
+        returncode = proc.wait()
+        if failed.is_set():
+            print(f"Decoding failed, {output_path} is incomplete")
+            return False
+        if returncode != 0:
+            print(f"FFmpeg error: exit code {returncode}")
+            return False
+
         print(f"✔ Final output: {output_path}")
         return True
 
-
 if __name__ == "__main__":
     cropper = FaceTrackingCropper(smoothing_factor=0.8)
     
@@ -1,5 +1,9 @@
 import os
-import json
+import orjson
+import bisect
+from itertools import accumulate
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from youtube_transcript_api import YouTubeTranscriptApi
 from utils import fileSafe
 
@@ -9,6 +13,10 @@ class TranscriptManager:
         self.folder = folder
         self.transcript = None          # Loaded transcript
         self.segments = None           # Loaded segments
+        self._indexed = None           # Transcript the time index below was built for
+        self._starts = self._ends = self._max_ends = None
+        self._texts = None
+        self._text_blob = self._lower_blob = None
 
     def get_transcript(self):
         """Download transcript from YouTube"""
@@ -26,8 +34,8 @@ class TranscriptManager:
         try:
             os.makedirs(self.folder, exist_ok=True)
             filename = os.path.join(self.folder, f"{self.video_id}_transcript.json")
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump(self.transcript, f, ensure_ascii=False, indent=4)
+            with open(filename, "wb") as f:
+                f.write(orjson.dumps(self.transcript, option=orjson.OPT_INDENT_2))
             print(f"Transcript saved to: {filename}")
             return filename
         except Exception as e:
@@ -44,36 +52,73 @@ class TranscriptManager:
 
     def get_text_by_timestamp(self, timestamp):
         """Return text at a specific timestamp."""
-        for entry in self.transcript:
-            start = entry["start"]
-            end = start + entry["duration"]
-            if start <= timestamp < end:
-                return entry["text"]
+        self._index_transcript()
+        lo = bisect.bisect_right(self._max_ends, timestamp)
+        hi = bisect.bisect_right(self._starts, timestamp)
+        for i in range(lo, hi):
+            if timestamp < self._ends[i]:
+                return self._texts[i]
         return f"No text found at {timestamp} seconds"
 
+    @staticmethod
+    def _join_texts(texts):
+        """
+        Join texts into one string for substring search, with the offset each text starts at.
+        The NUL separator keeps a match from spanning two entries.
+        """
+        offsets = []
+        pos = 0
+        for text in texts:
+            offsets.append(pos)
+            pos += len(text) + 1
+        return "\0".join(texts), offsets
+
+    def _index_transcript(self):
+        """
+        Lay the (start-sorted) transcript out as columns: start/end time lists for bisect,
+        the texts, and the texts joined (as-is and lowercased) for searching.
+        Lookups are single scalar queries, where bisect beats NumPy's per-call overhead.
+        """
+        if self._indexed is self.transcript:
+            return
+        self._starts = [entry["start"] for entry in self.transcript]
+        self._ends = [start + entry["duration"] for start, entry in zip(self._starts, self.transcript)]
+        self._texts = [entry["text"] for entry in self.transcript]
+        self._text_blob = self._join_texts(self._texts)
+        self._lower_blob = self._join_texts([text.lower() for text in self._texts])
+        # Entries may overlap, so search on the running max of the end times
+        self._max_ends = list(accumulate(self._ends, max))
+        self._indexed = self.transcript
+
     def get_text_in_range(self, start_time, end_time):
         """Return transcript entries within a time range."""
-        result = []
-        for entry in self.transcript:
-            entry_start = entry["start"]
-            entry_end = entry_start + entry["duration"]
-            if entry_start < end_time and entry_end > start_time:
-                result.append(entry)
-        return result
+        self._index_transcript()
+        lo = bisect.bisect_right(self._max_ends, start_time)
+        hi = bisect.bisect_left(self._starts, end_time)
+        return [self.transcript[i] for i in range(lo, hi) if self._ends[i] > start_time]
 
     def search_text(self, search_term, case_sensitive=False):
         """Search transcript for a term."""
         results = []
+        self._index_transcript()
+        if not self.transcript:
+            return results
         term = search_term if case_sensitive else search_term.lower()
-        for entry in self.transcript:
-            text = entry["text"] if case_sensitive else entry["text"].lower()
-            if term in text:
-                results.append(entry)
+        blob, offsets = self._text_blob if case_sensitive else self._lower_blob
+
+        # Let str.find scan the whole transcript in C, and only resolve the matches to entries
+        pos = blob.find(term)
+        while pos != -1:
+            i = bisect.bisect_right(offsets, pos) - 1
+            results.append(self.transcript[i])
+            if i + 1 == len(offsets):
+                break
+            pos = blob.find(term, offsets[i + 1])
         return results
 
     def load_segments(self, segments_path):
-        with open(segments_path, "r", encoding="utf-8") as f:
-            self.segments = json.load(f)
+        with open(segments_path, "rb") as f:
+            self.segments = orjson.loads(f.read())
         return self.segments
 
     def merge_segments_with_subtitles(self):
@@ -99,60 +144,58 @@ class TranscriptManager:
 
     def merge_segments_with_subtitles_files(self, segments_path, transcript_path, output_path):
         """Load files, merge subtitles, and save output."""
-        with open(segments_path, "r", encoding="utf-8") as f:
-            self.segments = json.load(f)
-        with open(transcript_path, "r", encoding="utf-8") as f:
-            self.transcript = json.load(f)
+        with open(segments_path, "rb") as f:
+            self.segments = orjson.loads(f.read())
+        with open(transcript_path, "rb") as f:
+            self.transcript = orjson.loads(f.read())
 
         merged_segments = []
         for seg in self.segments:
-            subs = []
-            for entry in self.transcript:
-                entry_start = entry["start"]
-                entry_end = entry_start + entry["duration"]
-                if entry_start < seg["end_time"] and entry_end > seg["start_time"]:
-                    relative_start = entry_start - seg["start_time"]
-                    subs.append({"start": relative_start, "text": entry["text"]})
-            seg["subtitles"] = subs
+            subs = self.get_text_in_range(seg["start_time"], seg["end_time"])
+            seg["subtitles"] = [
+                    {
+                        "start": entry["start"] - seg["start_time"],
+                        "text": entry["text"]
+                    }
+                    for entry in subs
+                ]
             merged_segments.append(seg)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(merged_segments, f, ensure_ascii=False, indent=4)
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(merged_segments, option=orjson.OPT_INDENT_2))
 
         self.segments = merged_segments
         return merged_segments
 
     def json_to_srt(self, segment_index, output_srt_path):
         """Convert subtitles for one segment (by index) into an SRT file."""
-        def seconds_to_srt_time(seconds):
-            hours, remainder = divmod(int(seconds), 3600)
-            minutes, remainder = divmod(remainder, 60)
-            secs = int(seconds % 60)
-            millis = int((seconds - int(seconds)) * 1000)
-            return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
-
         if self.segments is None:
             raise Exception("Segments not loaded or merged")
 
-        segment = self.segments[segment_index]
-        subtitles = segment["subtitles"]
-        srt_lines = []
+        self._write_srt(self.segments[segment_index], output_srt_path)
 
-        for idx, sub in enumerate(subtitles, 1):
-            abs_start = max(sub["start"], 0)
-            if idx < len(subtitles):
-                abs_end = max(subtitles[idx]["start"], 0)
-            else:
-                abs_end = segment["duration"]
+    @staticmethod
+    def _write_srt(segment, output_srt_path):
+        """Write the subtitles of one merged segment as an SRT file."""
+        def srt_times(seconds):
+            """Format an array of non-negative seconds as SRT timestamps, the arithmetic vectorized."""
+            whole = seconds.astype(np.int64)
+            millis = ((seconds - whole) * 1000).astype(np.int64)
+            hours, remainder = np.divmod(whole, 3600)
+            minutes, secs = np.divmod(remainder, 60)
+            return [f"{h:02}:{m:02}:{s:02},{ms:03}"
+                    for h, m, s, ms in zip(hours.tolist(), minutes.tolist(), secs.tolist(), millis.tolist())]
 
-            srt_lines.append(
-                f"{idx}\n"
-                f"{seconds_to_srt_time(abs_start)} --> {seconds_to_srt_time(abs_end)}\n"
-                f"{sub['text']}\n"
-            )
+        subtitles = segment["subtitles"]
+        # Each subtitle lasts until the next one starts, the last one until the segment ends
+        starts = np.maximum(np.array([sub["start"] for sub in subtitles], dtype=float), 0)
+        ends = np.append(starts[1:], segment["duration"])
 
         with open(output_srt_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(srt_lines))
+            for idx, (sub, start, end) in enumerate(zip(subtitles, srt_times(starts), srt_times(ends)), 1):
+                if idx > 1:
+                    f.write("\n")
+                f.write(f"{idx}\n{start} --> {end}\n{sub['text']}\n")
     
     def export_all_srts(self, output_folder="generated/subtitles"):
         """
@@ -164,14 +207,26 @@ class TranscriptManager:
 
         os.makedirs(output_folder, exist_ok=True)
 
+        filenames = []
+        by_filename = {}
         for idx, segment in enumerate(self.segments):
             # get per-segment title
             title = segment.get("yt_title", f"segment_{idx + 1}")
             # make the title safe for a file name
             safe_title = fileSafe(title)
             filename = os.path.join(output_folder, f"{safe_title}.srt")
-
-            self.json_to_srt(idx, filename)
+            filenames.append(filename)
+            by_filename.setdefault(filename, []).append(segment)
+
+        def write_all(filename, segments):
+            # Segments whose titles collide share a file: write them in order, the last one wins
+            for segment in segments:
+                self._write_srt(segment, filename)
+
+        # Each file is independent and mostly I/O, so write them concurrently
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            list(executor.map(write_all, by_filename.keys(), by_filename.values()))
+        for filename in filenames:
             print(f"Saved: {filename}")
 
 
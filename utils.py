@@ -1,17 +1,49 @@
 import os
-import json
+import orjson
+import subprocess
+from functools import lru_cache
 
+# Keyframe timestamps per video file, filled lazily by keyframe_times()
+_keyframe_cache = {}
+
+class _SafeCharTable(dict):
+    """str.translate table keeping letters and digits of any script and " _-", everything else becomes "_"."""
+    def __missing__(self, code):
+        c = chr(code)
+        self[code] = c if c.isalnum() or c in " _-" else "_"
+        return self[code]
+
+_SAFE_CHARS = _SafeCharTable()
+
+
+@lru_cache(maxsize=None)
 def fileSafe(text):
-    safe_text = "".join(c if c.isalnum() or c in " _-" else "_" for c in text)
-    return safe_text
+    return text.translate(_SAFE_CHARS)
+
+
+def keyframe_times(filename):
+    """
+    Return the sorted timestamps (in seconds) of the video keyframes in filename.
+    Only packet headers are read, nothing is decoded, and the result is cached per file.
+    """
+    if filename not in _keyframe_cache:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=print_section=0", filename],
+            capture_output=True, text=True, check=True
+        )
+        times = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                times.append(float(pts_time))
+        _keyframe_cache[filename] = sorted(times)
+    return _keyframe_cache[filename]
 
 
 def return_files_in_directory(directory):
-    lst = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            lst.append(file[:-4])
-    return lst
+    # The generated folders are flat, a single scandir avoids walking a tree
+    return [entry.name[:-4] for entry in os.scandir(directory) if entry.is_file()]
 
 
 def create_generated_structure():
@@ -30,5 +62,9 @@ def create_generated_structure():
 
 def save_segment_to_json(segment):
     json_path = os.path.join("generated/transcripts/segments.json")
-    with open(json_path, 'w') as f:
-        json.dump(segment, f, indent=4)
\ No newline at end of file
+    with open(json_path, 'wb') as f:
+        f.write(orjson.dumps(segment, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == "__main__":
+    print(return_files_in_directory("generated/video"))